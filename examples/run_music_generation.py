@@ -25,6 +25,14 @@ if __name__ == "__main__":
     if torch.cuda.is_available():
         device = torch.device("cuda")
         dtype = torch.bfloat16
+        # Let cuDNN autotune conv kernels and allow TF32 for any FP32 matmuls
+        torch.backends.cudnn.benchmark = True
+        try:
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            torch.set_float32_matmul_precision("high")
+        except AttributeError:
+            pass
     elif torch.backends.mps.is_available():
         device = torch.device("mps")
         dtype = torch.float16
@@ -38,7 +46,7 @@ if __name__ == "__main__":
         dtype=dtype,
         version=args.version,
     )
-    with torch.no_grad():
+    with torch.inference_mode():
         pipe(
             {
                 "lyrics": args.lyrics,
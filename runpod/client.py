@@ -7,15 +7,44 @@ Usage:
 Environment Variables:
     RUNPOD_API_KEY: Your RunPod API key
     RUNPOD_ENDPOINT_ID: Your deployed endpoint ID
+
+Install orjson for faster decoding of large base64 audio responses.
 """
 
 import os
 import sys
+import json
 import time
+import random
 import base64
+import shutil
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Base64 decode chunk size; a multiple of 4 so each chunk decodes on its own
+B64_CHUNK_CHARS = 64 * 1024
+
+
+def _dumps(obj) -> bytes:
+    """Serialize to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _loads(data):
+    """Parse JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 class HeartMuLaClient:
@@ -47,6 +76,72 @@ class HeartMuLaClient:
             "Content-Type": "application/json",
         }
 
+        # Reuse one pooled connection for submit + status polls
+        retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.headers.update(self.headers)
+
+    def close(self):
+        """Close the underlying HTTP session."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _submit(
+        self,
+        lyrics: str,
+        tags: str,
+        max_audio_length_ms: int,
+        temperature: float,
+        topk: int,
+        cfg_scale: float,
+    ) -> str:
+        """Submit a job to the async /run endpoint and return its ID."""
+        payload = {
+            "input": {
+                "lyrics": lyrics,
+                "tags": tags,
+                "max_audio_length_ms": max_audio_length_ms,
+                "temperature": temperature,
+                "topk": topk,
+                "cfg_scale": cfg_scale,
+            }
+        }
+
+        response = self.session.post(
+            f"{self.base_url}/run",
+            data=_dumps(payload),
+        )
+        response.raise_for_status()
+        result = _loads(response.content)
+
+        job_id = result.get("id")
+        if not job_id:
+            raise RuntimeError(f"No job ID returned: {result}")
+
+        print(f"Job submitted: {job_id}")
+        return job_id
+
+    def _get_status(self, job_id: str) -> dict:
+        """Fetch the current status (and output, once finished) of a job."""
+        status_response = self.session.get(
+            f"{self.base_url}/status/{job_id}",
+        )
+        status_response.raise_for_status()
+        return _loads(status_response.content)
+
+    @staticmethod
+    def _backoff_sleep(attempt: int, poll_interval: float, max_poll: float):
+        """Sleep for an exponentially growing, jittered interval."""
+        delay = min(max_poll, poll_interval * (1.5 ** attempt))
+        time.sleep(delay + random.uniform(0, 0.25 * poll_interval))
+
     def generate(
         self,
         lyrics: str,
@@ -57,6 +152,8 @@ class HeartMuLaClient:
         cfg_scale: float = 1.5,
         timeout: int = 300,
         poll_interval: int = 5,
+        max_poll: int = 15,
+        stream: bool = False,
     ) -> dict:
         """
         Generate music from lyrics.
@@ -69,46 +166,36 @@ class HeartMuLaClient:
             topk: Top-k sampling parameter
             cfg_scale: Classifier-free guidance scale
             timeout: Maximum time to wait for completion (seconds)
-            poll_interval: Time between status checks (seconds)
+            poll_interval: Initial time between status checks (seconds)
+            max_poll: Upper bound on the backed-off poll interval (seconds)
+            stream: Wait on the /stream endpoint instead of polling /status
 
         Returns:
             dict with audio_base64, duration_ms, sample_rate, format
         """
-        # Submit the job
-        payload = {
-            "input": {
-                "lyrics": lyrics,
-                "tags": tags,
-                "max_audio_length_ms": max_audio_length_ms,
-                "temperature": temperature,
-                "topk": topk,
-                "cfg_scale": cfg_scale,
-            }
-        }
+        if stream:
+            return self.generate_stream(
+                lyrics=lyrics,
+                tags=tags,
+                max_audio_length_ms=max_audio_length_ms,
+                temperature=temperature,
+                topk=topk,
+                cfg_scale=cfg_scale,
+                timeout=timeout,
+                poll_interval=poll_interval,
+                max_poll=max_poll,
+            )
 
-        response = requests.post(
-            f"{self.base_url}/run",
-            headers=self.headers,
-            json=payload,
+        job_id = self._submit(
+            lyrics, tags, max_audio_length_ms, temperature, topk, cfg_scale
         )
-        response.raise_for_status()
-        result = response.json()
 
-        job_id = result.get("id")
-        if not job_id:
-            raise RuntimeError(f"No job ID returned: {result}")
-
-        print(f"Job submitted: {job_id}")
-
-        # Poll for completion
+        # Poll for completion with exponential backoff and jitter
         start_time = time.time()
+        attempt = 0
+        last_status = None
         while time.time() - start_time < timeout:
-            status_response = requests.get(
-                f"{self.base_url}/status/{job_id}",
-                headers=self.headers,
-            )
-            status_response.raise_for_status()
-            status = status_response.json()
+            status = self._get_status(job_id)
 
             job_status = status.get("status")
             print(f"Status: {job_status}")
@@ -124,13 +211,95 @@ class HeartMuLaClient:
                 raise RuntimeError(f"Job failed: {error}")
 
             elif job_status in ["IN_QUEUE", "IN_PROGRESS"]:
-                time.sleep(poll_interval)
+                # Restart the backoff once the job leaves the queue
+                if job_status == "IN_PROGRESS" and last_status != "IN_PROGRESS":
+                    attempt = 0
+                last_status = job_status
+                self._backoff_sleep(attempt, poll_interval, max_poll)
+                attempt += 1
 
             else:
                 raise RuntimeError(f"Unknown status: {job_status}")
 
         raise TimeoutError(f"Job {job_id} timed out after {timeout} seconds")
 
+    def generate_stream(
+        self,
+        lyrics: str,
+        tags: str = "pop,upbeat",
+        max_audio_length_ms: int = 120000,
+        temperature: float = 1.0,
+        topk: int = 50,
+        cfg_scale: float = 1.5,
+        timeout: int = 300,
+        poll_interval: int = 5,
+        max_poll: int = 15,
+    ) -> dict:
+        """
+        Generate music and wait on the /stream endpoint for the result.
+
+        The server holds each /stream request open and pushes status updates,
+        so the result arrives as soon as the job finishes instead of on the
+        next poll. If a /stream request ends before the job finishes, the
+        reconnect is delayed with the same backoff as generate().
+        """
+        job_id = self._submit(
+            lyrics, tags, max_audio_length_ms, temperature, topk, cfg_scale
+        )
+
+        start_time = time.time()
+        attempt = 0
+        last_status = None
+        while time.time() - start_time < timeout:
+            remaining = max(1, timeout - (time.time() - start_time))
+            with self.session.get(
+                f"{self.base_url}/stream/{job_id}",
+                stream=True,
+                timeout=remaining,
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    status = _loads(line)
+
+                    job_status = status.get("status")
+                    print(f"Status: {job_status}")
+
+                    if job_status == "COMPLETED":
+                        output = status.get("output")
+                        if output is None:
+                            chunks = status.get("stream") or [{}]
+                            output = chunks[-1].get("output")
+                        if not output:
+                            # Non-generator handlers leave the stream empty;
+                            # the result is only available from /status
+                            output = self._get_status(job_id).get("output")
+                        if not output:
+                            raise RuntimeError(f"Job {job_id} completed without output")
+                        if "error" in output:
+                            raise RuntimeError(f"Generation error: {output['error']}")
+                        return output
+
+                    elif job_status == "FAILED":
+                        error = status.get("error", "Unknown error")
+                        raise RuntimeError(f"Job failed: {error}")
+
+                    elif job_status in ["IN_QUEUE", "IN_PROGRESS"]:
+                        # Restart the backoff once the job leaves the queue
+                        if job_status == "IN_PROGRESS" and last_status != "IN_PROGRESS":
+                            attempt = 0
+                        last_status = job_status
+
+                    else:
+                        raise RuntimeError(f"Unknown status: {job_status}")
+
+            # The stream closed before the job finished; back off before reconnecting
+            self._backoff_sleep(attempt, poll_interval, max_poll)
+            attempt += 1
+
+        raise TimeoutError(f"Job {job_id} timed out after {timeout} seconds")
+
     def generate_sync(
         self,
         lyrics: str,
@@ -157,14 +326,13 @@ class HeartMuLaClient:
             }
         }
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/runsync",
-            headers=self.headers,
-            json=payload,
+            data=_dumps(payload),
             timeout=timeout,
         )
         response.raise_for_status()
-        result = response.json()
+        result = _loads(response.content)
 
         if result.get("status") == "COMPLETED":
             output = result.get("output", {})
@@ -176,16 +344,36 @@ class HeartMuLaClient:
 
     def save_audio(self, result: dict, output_path: str):
         """Save the generated audio to a file."""
-        audio_base64 = result.get("audio_base64")
-        if not audio_base64:
-            raise ValueError("No audio data in result")
-
-        audio_data = base64.b64decode(audio_base64)
-        with open(output_path, "wb") as f:
-            f.write(audio_data)
+        audio_url = result.get("audio_url")
+        if audio_url:
+            # Presigned URLs carry their own auth; don't send the RunPod key
+            with self.session.get(
+                audio_url,
+                headers={"Authorization": None, "Content-Type": None},
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                with open(output_path, "wb") as f:
+                    shutil.copyfileobj(response.raw, f)
+            size = os.path.getsize(output_path)
+        else:
+            audio_base64 = result.get("audio_base64")
+            if not audio_base64:
+                raise ValueError("No audio data in result")
+
+            # Decode in 4-char-aligned chunks so the full binary is never held in memory
+            size = 0
+            with open(output_path, "wb") as f:
+                for start in range(0, len(audio_base64), B64_CHUNK_CHARS):
+                    chunk = base64.b64decode(
+                        audio_base64[start : start + B64_CHUNK_CHARS]
+                    )
+                    f.write(chunk)
+                    size += len(chunk)
 
         print(f"Saved audio to: {output_path}")
-        print(f"Size: {len(audio_data)} bytes")
+        print(f"Size: {size} bytes")
         print(f"Format: {result.get('format', 'unknown')}")
         print(f"Sample rate: {result.get('sample_rate', 'unknown')} Hz")
 
@@ -202,44 +390,49 @@ def main():
     parser.add_argument("--api-key", help="RunPod API key (or set RUNPOD_API_KEY)")
     parser.add_argument("--endpoint-id", help="RunPod endpoint ID (or set RUNPOD_ENDPOINT_ID)")
     parser.add_argument("--sync", action="store_true", help="Use synchronous endpoint")
+    parser.add_argument("--stream", action="store_true", help="Wait on the /stream endpoint instead of polling")
 
     args = parser.parse_args()
 
-    # Read lyrics from file if path provided
+    # Read lyrics from file if path provided; multi-line or very long
+    # values are inline lyrics and never worth an open() attempt
     lyrics = args.lyrics
-    if os.path.isfile(lyrics):
-        with open(lyrics, "r") as f:
-            lyrics = f.read()
+    if len(lyrics) < 4096 and "\n" not in lyrics:
+        try:
+            with open(lyrics, "r") as f:
+                lyrics = f.read()
+        except OSError:
+            pass
 
     # Create client
-    client = HeartMuLaClient(
+    with HeartMuLaClient(
         api_key=args.api_key,
         endpoint_id=args.endpoint_id,
-    )
-
-    # Generate music
-    print("Generating music...")
-    if args.sync:
-        result = client.generate_sync(
-            lyrics=lyrics,
-            tags=args.tags,
-            max_audio_length_ms=args.max_length,
-            temperature=args.temperature,
-            topk=args.topk,
-            cfg_scale=args.cfg_scale,
-        )
-    else:
-        result = client.generate(
-            lyrics=lyrics,
-            tags=args.tags,
-            max_audio_length_ms=args.max_length,
-            temperature=args.temperature,
-            topk=args.topk,
-            cfg_scale=args.cfg_scale,
-        )
+    ) as client:
+        # Generate music
+        print("Generating music...")
+        if args.sync:
+            result = client.generate_sync(
+                lyrics=lyrics,
+                tags=args.tags,
+                max_audio_length_ms=args.max_length,
+                temperature=args.temperature,
+                topk=args.topk,
+                cfg_scale=args.cfg_scale,
+            )
+        else:
+            result = client.generate(
+                lyrics=lyrics,
+                tags=args.tags,
+                max_audio_length_ms=args.max_length,
+                temperature=args.temperature,
+                topk=args.topk,
+                cfg_scale=args.cfg_scale,
+                stream=args.stream,
+            )
 
-    # Save audio
-    client.save_audio(result, args.output)
+        # Save audio
+        client.save_audio(result, args.output)
     print("Done!")
 
 
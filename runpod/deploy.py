@@ -24,6 +24,8 @@ import argparse
 import subprocess
 import requests
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 def build_and_push_image(docker_user: str, tag: str = "latest"):
@@ -55,7 +57,12 @@ def build_and_push_image(docker_user: str, tag: str = "latest"):
     return image_name
 
 
-def create_endpoint(api_key: str, image_name: str, endpoint_name: str = "heartmula-music-gen"):
+def create_endpoint(
+    api_key: str,
+    image_name: str,
+    endpoint_name: str = "heartmula-music-gen",
+    enable_mps: bool = False,
+):
     """Create a RunPod serverless endpoint."""
     url = "https://api.runpod.io/graphql"
     headers = {
@@ -95,13 +102,31 @@ def create_endpoint(api_key: str, image_name: str, endpoint_name: str = "heartmu
         }
     }
 
-    response = requests.post(
-        url,
-        headers=headers,
-        json={"query": mutation, "variables": variables},
+    if enable_mps:
+        variables["input"]["env"] += [
+            {"key": "ENABLE_MPS", "value": "1"},
+            {"key": "CUDA_MPS_PIPE_DIRECTORY", "value": "/tmp/nvidia-mps"},
+        ]
+
+    # Retry transient gateway errors; POST is opted in explicitly since
+    # urllib3 only retries idempotent methods by default. 504 is left out:
+    # the saveEndpoint mutation may already have run, and a retry would
+    # create a duplicate endpoint
+    retry = Retry(
+        total=5,
+        backoff_factor=1.0,
+        status_forcelist=[502, 503],
+        allowed_methods=frozenset(["POST"]),
     )
-    response.raise_for_status()
-    result = response.json()
+    with requests.Session() as session:
+        session.mount("https://", HTTPAdapter(max_retries=retry))
+        response = session.post(
+            url,
+            headers=headers,
+            json={"query": mutation, "variables": variables},
+        )
+        response.raise_for_status()
+        result = response.json()
 
     if "errors" in result:
         print(f"Error creating endpoint: {result['errors']}")
@@ -212,6 +237,7 @@ def main():
     create_parser.add_argument("--api-key", required=True, help="RunPod API key")
     create_parser.add_argument("--image", required=True, help="Docker image name")
     create_parser.add_argument("--name", default="heartmula-music-gen", help="Endpoint name")
+    create_parser.add_argument("--enable-mps", action="store_true", help="Start the NVIDIA MPS daemon in each worker")
 
     # Instructions command
     subparsers.add_parser("instructions", help="Show deployment instructions")
@@ -221,7 +247,7 @@ def main():
     if args.command == "build":
         build_and_push_image(args.docker_user, args.tag)
     elif args.command == "create-endpoint":
-        create_endpoint(args.api_key, args.image, args.name)
+        create_endpoint(args.api_key, args.image, args.name, args.enable_mps)
     elif args.command == "instructions":
         get_instructions()
     else:
@@ -0,0 +1,21 @@
+#!/bin/sh
+# Optionally start the NVIDIA MPS control daemon, then hand off to the handler.
+#
+# Off by default: a RunPod serverless worker is one container running one
+# Python process, so there is no other CUDA context for MPS to share. Set
+# ENABLE_MPS=1 only when several CUDA processes run in this container.
+set -e
+
+if [ "${ENABLE_MPS:-0}" = "1" ]; then
+    export CUDA_MPS_PIPE_DIRECTORY="${CUDA_MPS_PIPE_DIRECTORY:-/tmp/nvidia-mps}"
+    export CUDA_MPS_LOG_DIRECTORY="${CUDA_MPS_LOG_DIRECTORY:-/tmp/nvidia-log}"
+
+    if command -v nvidia-cuda-mps-control >/dev/null 2>&1; then
+        mkdir -p "$CUDA_MPS_PIPE_DIRECTORY" "$CUDA_MPS_LOG_DIRECTORY"
+        nvidia-cuda-mps-control -d || echo "MPS daemon failed to start, continuing without it"
+    else
+        echo "nvidia-cuda-mps-control not found, continuing without MPS"
+    fi
+fi
+
+exec python -u /app/handler.py "$@"
@@ -22,22 +22,139 @@ Output format:
     "sample_rate": int,
     "format": "mp3"
 }
+
+If S3_BUCKET is set, the MP3 is uploaded to that bucket instead and the
+output carries a presigned download link in place of the base64 payload:
+{
+    "audio_url": "presigned GET url for the mp3",
+    "duration_ms": int,
+    "sample_rate": int,
+    "format": "mp3"
+}
 """
 
+import io
 import os
+import math
 import sys
-import base64
-import tempfile
-import subprocess
-
-# Add parent directory to path for heartlib imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-sys.path.insert(0, "/app")
-sys.path.insert(0, "/app/src")
+import binascii
+import threading
+import traceback
+from dataclasses import dataclass, fields
+
+# heartlib is pip-installed in the image; when run from a repo checkout, fall
+# back to its src/ directory, appended so stdlib and site-packages win
+_SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+if os.path.isdir(_SRC_DIR) and _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
+
+# The GPU does the heavy lifting; a small CPU pool avoids thread contention
+# and launch jitter. OMP/MKL read these at torch import, so set them first.
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "2"))
+os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_NUM_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(TORCH_NUM_THREADS))
+if os.environ.get("RUNPOD_PIN_CPU") == "1" and hasattr(os, "sched_setaffinity"):
+    os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:TORCH_NUM_THREADS])
 
 # Global model instance for warm starts
 MODEL = None
+# Bound MODEL.__call__, resolved once at load time
+PIPE_CALL = None
+# The pipeline keeps per-call KV caches on the model; one generation at a time
+PIPE_LOCK = threading.Lock()
+# Guards the one-time model load (download, quantize, compile, warm-up)
+LOAD_LOCK = threading.Lock()
 MODEL_PATH = os.environ.get("MODEL_PATH", "/app/ckpt")
+USE_TORCH_COMPILE = os.environ.get("USE_TORCH_COMPILE", "1") == "1"
+# Load and warm the model at worker start instead of on the first job
+PRELOAD = os.environ.get("RUNPOD_PRELOAD", "1") == "1"
+# Include full tracebacks in error responses (off by default)
+DEBUG_TRACEBACK = os.environ.get("DEBUG_TRACEBACK", "0") == "1"
+# Weight-only quantization for the 3B transformer: "nf4", "int8", "fp8" or
+# "bf16". Unset picks nf4 on GPUs below NF4_AUTO_MAX_GIB and bf16 otherwise.
+MODEL_QUANT = os.environ.get("MODEL_QUANT", "").lower()
+QUANT_MODES = ("nf4", "int8", "fp8", "bf16")
+NF4_AUTO_MAX_GIB = 20
+
+
+@dataclass(slots=True)
+class GenParams:
+    """Parsed job input; field defaults are the documented input defaults."""
+
+    lyrics: str
+    tags: str = "pop,upbeat"
+    max_audio_length_ms: int = 120000
+    temperature: float = 1.0
+    topk: int = 50
+    cfg_scale: float = 1.5
+
+    @classmethod
+    def from_input(cls, job_input: dict) -> "GenParams":
+        """
+        Build from a job input dict.
+
+        Text fields must already be strings. Numeric fields accept numbers or
+        numeric strings, but not bools. Int fields take ints, decimal digit
+        strings or integral floats; float fields must be finite.
+        """
+        params = {}
+        for field in fields(cls):
+            if field.name not in job_input:
+                continue
+            value = job_input[field.name]
+
+            if field.type is str:
+                if not isinstance(value, str):
+                    raise TypeError(f"{field.name} must be a string")
+            else:
+                if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                    raise TypeError(f"{field.name} must be a number")
+                if field.type is int:
+                    value = cls._parse_int(field.name, value)
+                else:
+                    if isinstance(value, str) and "_" in value:
+                        raise ValueError(f"{field.name} must be a number")
+                    value = float(value)
+                    if not math.isfinite(value):
+                        raise ValueError(f"{field.name} must be finite")
+            params[field.name] = value
+        return cls(**params)
+
+    @staticmethod
+    def _parse_int(name: str, value) -> int:
+        """Convert without a float round-trip so large ints stay exact."""
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError(f"{name} must be an integer")
+            return int(value)
+        digits = value.strip()
+        if not digits.lstrip("+-").isdecimal():
+            raise ValueError(f"{name} must be an integer")
+        return int(digits)
+
+
+# Base64 encode chunk size; a multiple of 3 so chunks concatenate cleanly
+B64_CHUNK_BYTES = 48 * 1024
+
+# Short prompts used to trigger compilation / autotuning before real requests
+# Prompts differ in length so dynamo marks the prompt dimension dynamic during
+# warm-up rather than recompiling on the first real request
+WARMUP_INPUTS = [
+    {"lyrics": "[Verse]\nwarm up", "tags": "pop"},
+    {
+        "lyrics": "[Verse]\nwarm up the model\n[Chorus]\nbefore the first job",
+        "tags": "pop,upbeat",
+    },
+]
+
+# Optional S3-compatible storage for returning audio by URL
+S3_BUCKET = os.environ.get("S3_BUCKET")
+S3_PREFIX = os.environ.get("S3_PREFIX", "heartmula")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+S3_URL_EXPIRES = int(os.environ.get("S3_URL_EXPIRES", "3600"))
+S3_CLIENT = None
 
 
 def download_models():
@@ -45,51 +162,68 @@ def download_models():
 
     heartmula_path = os.path.join(MODEL_PATH, "HeartMuLa-oss-3B")
     heartcodec_path = os.path.join(MODEL_PATH, "HeartCodec-oss")
-    tokenizer_path = os.path.join(MODEL_PATH, "tokenizer.json")
+    # Written only after every repo finished; snapshot_download creates the
+    # target directories as soon as it starts, so their presence proves nothing
+    complete_marker = os.path.join(MODEL_PATH, ".download_complete")
 
     # Check if models already exist
-    if (os.path.exists(heartmula_path) and
-        os.path.exists(heartcodec_path) and
-        os.path.exists(tokenizer_path)):
+    if os.path.exists(complete_marker):
         print("Models already downloaded.")
         return
 
     print("Downloading model weights from HuggingFace...")
 
-    # Download HeartMuLaGen (tokenizer and config)
-    print("Downloading HeartMuLaGen base files...")
-    subprocess.run([
-        "huggingface-cli", "download",
-        "HeartMuLa/HeartMuLaGen",
-        "--local-dir", MODEL_PATH
-    ], check=True)
-
-    # Download HeartMuLa-oss-3B
-    print("Downloading HeartMuLa-oss-3B (this may take a while)...")
-    subprocess.run([
-        "huggingface-cli", "download",
-        "HeartMuLa/HeartMuLa-oss-3B",
-        "--local-dir", heartmula_path
-    ], check=True)
-
-    # Download HeartCodec-oss
-    print("Downloading HeartCodec-oss...")
-    subprocess.run([
-        "huggingface-cli", "download",
-        "HeartMuLa/HeartCodec-oss",
-        "--local-dir", heartcodec_path
-    ], check=True)
+    from concurrent.futures import ThreadPoolExecutor
+    from huggingface_hub import snapshot_download
+
+    # HeartMuLaGen (tokenizer and config), HeartMuLa-oss-3B, HeartCodec-oss
+    downloads = [
+        ("HeartMuLa/HeartMuLaGen", MODEL_PATH),
+        ("HeartMuLa/HeartMuLa-oss-3B", heartmula_path),
+        ("HeartMuLa/HeartCodec-oss", heartcodec_path),
+    ]
+
+    def _download(repo_and_dir):
+        repo_id, local_dir = repo_and_dir
+        print(f"Downloading {repo_id}...")
+        return snapshot_download(repo_id=repo_id, local_dir=local_dir, max_workers=8)
+
+    # Fetch all three repos concurrently; partial files are resumed on retry
+    with ThreadPoolExecutor(max_workers=len(downloads)) as executor:
+        list(executor.map(_download, downloads))
+
+    with open(complete_marker, "w"):
+        pass
 
     print("All models downloaded successfully!")
 
 
 def load_model():
-    """Load the HeartMuLa model (called once on cold start)."""
-    global MODEL
+    """
+    Load the HeartMuLa model (called once on cold start).
 
-    if MODEL is not None:
+    Concurrent first callers wait on LOAD_LOCK. MODEL and PIPE_CALL are only
+    published once quantization, compilation and warm-up are done.
+    """
+    global MODEL, PIPE_CALL
+
+    if PIPE_CALL is not None:
         return MODEL
 
+    with LOAD_LOCK:
+        if PIPE_CALL is not None:
+            return MODEL
+
+        pipe = build_model()
+        MODEL = pipe
+        PIPE_CALL = pipe.__call__
+
+    print("Model loaded successfully!")
+    return MODEL
+
+
+def build_model():
+    """Download, load, quantize, freeze and optionally compile the pipeline."""
     # Download models if needed
     download_models()
 
@@ -98,80 +232,318 @@ def load_model():
 
     print("Loading HeartMuLa model...")
 
+    torch.set_num_threads(TORCH_NUM_THREADS)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed once any inter-op work has run
+        pass
+
     # Use CUDA with bfloat16 for optimal performance
     device = torch.device("cuda")
     dtype = torch.bfloat16
 
-    MODEL = HeartMuLaGenPipeline.from_pretrained(
+    # Let cuDNN autotune conv kernels and allow TF32 for any FP32 matmuls
+    torch.backends.cudnn.benchmark = True
+    try:
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        torch.set_float32_matmul_precision("high")
+    except AttributeError:
+        pass
+
+    quant = resolve_quant_mode()
+    bnb_config = None
+    if quant == "nf4":
+        from transformers import BitsAndBytesConfig
+
+        print("Loading HeartMuLa weights in nf4...")
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=dtype,
+            # keep the codebook-0 output head in full precision
+            llm_int8_skip_modules=["codebook0_head"],
+        )
+
+    pipe = HeartMuLaGenPipeline.from_pretrained(
         MODEL_PATH,
         device=device,
         dtype=dtype,
         version="3B",
+        bnb_config=bnb_config,
     )
 
-    print("Model loaded successfully!")
-    return MODEL
+    if quant in ("int8", "fp8"):
+        quantize_model(pipe, quant)
+
+    # Inference only: freeze weights so autograd never tracks them
+    for module in (pipe.model, pipe.audio_codec):
+        module.eval()
+        module.requires_grad_(False)
+
+    if USE_TORCH_COMPILE:
+        compile_model(pipe)
+
+    return pipe
 
 
-def generate_music(lyrics: str, tags: str = "pop,upbeat", **kwargs) -> dict:
+def resolve_quant_mode() -> str:
+    """Return the quantization mode from MODEL_QUANT, or pick one from GPU memory."""
+    import torch
+
+    if MODEL_QUANT:
+        if MODEL_QUANT not in QUANT_MODES:
+            raise ValueError(
+                f"Unsupported MODEL_QUANT: {MODEL_QUANT!r} (use one of {', '.join(QUANT_MODES)})"
+            )
+        return MODEL_QUANT
+
+    total_gib = torch.cuda.get_device_properties(0).total_memory / 1024**3
+    return "nf4" if total_gib < NF4_AUTO_MAX_GIB else "bf16"
+
+
+def quantize_model(pipe, quant: str):
     """
-    Generate music from lyrics and tags.
+    Apply torchao weight-only quantization to the HeartMuLa transformer.
 
-    Args:
-        lyrics: The lyrics text
-        tags: Comma-separated tags for style/genre
-        **kwargs: Additional generation parameters
+    Per-frame decoding is bound by weight bandwidth, so int8/fp8 weights cut
+    per-token latency. The codec and the codebook-0 output head are left in
+    full precision for audio fidelity.
+    """
+    from torchao.quantization import (
+        quantize_,
+        int8_weight_only,
+        float8_weight_only,
+    )
 
-    Returns:
-        dict with audio_base64, duration_ms, sample_rate, format
+    import torch.nn as nn
+
+    config = int8_weight_only() if quant == "int8" else float8_weight_only()
+
+    # Same as the nf4 path: keep the codebook-0 output head in full precision
+    def _filter(module, fqn):
+        return isinstance(module, nn.Linear) and fqn.split(".")[-1] != "codebook0_head"
+
+    print(f"Quantizing HeartMuLa weights to {quant}...")
+    quantize_(pipe.model, config, filter_fn=_filter)
+
+
+def run_pipeline(pipe, inputs: dict, **kwargs) -> io.BytesIO:
+    """
+    Run the pipeline into an in-memory MP3 buffer.
+
+    Always uses torch.inference_mode(): the model's KV caches are allocated
+    on the first call and are inference tensors from then on, so the grad
+    mode cannot be switched for later calls.
     """
     import torch
 
-    pipe = load_model()
+    # Encode straight into memory; no temp file round-trip
+    buf = io.BytesIO()
+    # autocast keeps any stray fp32 codec matmuls in bf16
+    with PIPE_LOCK, torch.inference_mode(), torch.autocast("cuda", dtype=torch.bfloat16):
+        pipe(inputs, save_path=buf, save_format="mp3", **kwargs)
+    return buf
+
+
+def warmup_model(pipe):
+    """Run short generations so later requests hit warm caches and captured graphs."""
+    for inputs in WARMUP_INPUTS:
+        run_pipeline(
+            pipe,
+            inputs,
+            max_audio_length_ms=10000,
+            topk=50,
+            temperature=1.0,
+            cfg_scale=1.5,
+        )
+
 
-    # Default parameters
-    max_audio_length_ms = kwargs.get("max_audio_length_ms", 120000)
-    temperature = kwargs.get("temperature", 1.0)
-    topk = kwargs.get("topk", 50)
-    cfg_scale = kwargs.get("cfg_scale", 1.5)
+def preload():
+    """Load and warm the model before the worker accepts jobs."""
+    load_model()
 
-    # Create temporary file for output
-    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_file:
-        output_path = tmp_file.name
+    # compile_model() already ran a warm-up generation
+    if USE_TORCH_COMPILE:
+        return
 
+    # Trigger cuDNN autotuning and allocator growth; a failure here
+    # should not keep the worker from booting
     try:
-        # Generate music
-        with torch.no_grad():
-            pipe(
-                {
-                    "lyrics": lyrics,
-                    "tags": tags,
-                },
-                max_audio_length_ms=max_audio_length_ms,
-                save_path=output_path,
-                topk=topk,
-                temperature=temperature,
-                cfg_scale=cfg_scale,
+        warmup_model(PIPE_CALL)
+    except Exception as e:
+        print(f"Warm-up generation failed: {e}")
+
+
+def compile_model(pipe):
+    """
+    Compile the per-frame backbone and decoder transformers with torch.compile.
+
+    The warm-up generations populate the dynamo cache and capture the
+    steady-state single-frame step as a CUDA graph. Shapes are left to dynamo's
+    automatic dynamic detection: dynamic=False would recompile the backbone for
+    every new prompt length. The prompt (prefill) graph is dynamic in length
+    and runs without CUDA graphs, since CUDA graph trees would record a new
+    graph for every distinct prompt length. If compilation fails the eager
+    modules are restored.
+    """
+    import torch
+    import torch._inductor.config
+
+    heartmula = pipe.model
+    eager_modules = (heartmula.backbone, heartmula.decoder)
+
+    # Leave room for the prompt and single-frame shapes of both transformers
+    torch._dynamo.config.cache_size_limit = 64
+    # CUDA-graph only the static single-frame step, not the dynamic prefill
+    torch._inductor.config.triton.cudagraph_skip_dynamic_graphs = True
+
+    print("Compiling HeartMuLa transformers...")
+    heartmula.backbone = torch.compile(
+        heartmula.backbone, mode="reduce-overhead", fullgraph=False
+    )
+    heartmula.decoder = torch.compile(
+        heartmula.decoder, mode="reduce-overhead", fullgraph=False
+    )
+
+    try:
+        warmup_model(pipe)
+    except Exception as e:
+        print(f"torch.compile warm-up failed, using eager modules: {e}")
+        heartmula.backbone, heartmula.decoder = eager_modules
+
+
+def get_s3_client():
+    """Create the S3 client once per worker and reuse it across requests."""
+    global S3_CLIENT
+
+    if S3_CLIENT is None:
+        import boto3
+
+        S3_CLIENT = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL)
+    return S3_CLIENT
+
+
+def upload_audio(buf) -> str:
+    """Upload the generated MP3 buffer to S3_BUCKET and return a presigned GET URL."""
+    import uuid
+
+    s3 = get_s3_client()
+    key = f"{S3_PREFIX}/{uuid.uuid4().hex}.mp3"
+    buf.seek(0)
+    s3.upload_fileobj(buf, S3_BUCKET, key, ExtraArgs={"ContentType": "audio/mpeg"})
+
+    return s3.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": S3_BUCKET, "Key": key},
+        ExpiresIn=S3_URL_EXPIRES,
+    )
+
+
+def encode_base64(buf) -> str:
+    """
+    Base64-encode the buffer in chunks and release it before the final decode.
+
+    Encoding 48 KiB slices (a multiple of 3 bytes, so no interior padding) of a
+    view avoids materializing a full bytes copy alongside the encoded output.
+    """
+    encoded = bytearray()
+    with buf.getbuffer() as audio_data:
+        for start in range(0, audio_data.nbytes, B64_CHUNK_BYTES):
+            encoded += binascii.b2a_base64(
+                audio_data[start : start + B64_CHUNK_BYTES], newline=False
             )
+    buf.close()
+    return encoded.decode("ascii")
+
+
+def generate_music(
+    lyrics: str,
+    tags: str,
+    max_audio_length_ms: int,
+    temperature: float,
+    topk: int,
+    cfg_scale: float,
+) -> dict:
+    """
+    Generate music from lyrics and tags.
 
-        # Read and encode the output
-        with open(output_path, "rb") as f:
-            audio_data = f.read()
+    Defaults live only on GenParams and are applied by handler().
 
-        audio_base64 = base64.b64encode(audio_data).decode("utf-8")
+    Args:
+        lyrics: The lyrics text
+        tags: Comma-separated tags for style/genre
+        max_audio_length_ms: Maximum audio length in milliseconds
+        temperature: Sampling temperature
+        topk: Top-k sampling parameter
+        cfg_scale: Classifier-free guidance scale
 
-        return {
-            "audio_base64": audio_base64,
-            "duration_ms": max_audio_length_ms,
-            "sample_rate": 48000,
-            "format": "mp3",
-            "size_bytes": len(audio_data),
-        }
+    Returns:
+        dict with audio_buffer (in-memory MP3), duration_ms, sample_rate,
+        format, size_bytes
+    """
+    # Lazy fallback when the worker did not preload; load_model() lets only
+    # the first caller load and compile, the rest wait for it
+    if PIPE_CALL is None:
+        load_model()
+    pipe = PIPE_CALL
+
+    # Generate music
+    buf = run_pipeline(
+        pipe,
+        {
+            "lyrics": lyrics,
+            "tags": tags,
+        },
+        max_audio_length_ms=max_audio_length_ms,
+        topk=topk,
+        temperature=temperature,
+        cfg_scale=cfg_scale,
+    )
+
+    return {
+        "audio_buffer": buf,
+        "duration_ms": max_audio_length_ms,
+        "sample_rate": 48000,
+        "format": "mp3",
+        "size_bytes": buf.getbuffer().nbytes,
+    }
 
-    finally:
-        # Cleanup temp file
-        if os.path.exists(output_path):
-            os.remove(output_path)
+
+def run_job(job_input: dict) -> dict:
+    """
+    Validate job input and generate the audio, leaving it unencoded.
+
+    Returns:
+        generate_music() result, or dict with error
+    """
+    # Validate required input
+    lyrics = job_input.get("lyrics")
+    if not lyrics:
+        return {"error": "Missing required field: 'lyrics'"}
+
+    # Parse optional parameters over the defaults in one pass
+    try:
+        params = GenParams.from_input(job_input)
+    except (TypeError, ValueError, OverflowError) as e:
+        return {"error": f"Invalid input: {e}"}
+
+    # Validate parameters before touching the model
+    if params.max_audio_length_ms > 240000:
+        return {"error": "max_audio_length_ms cannot exceed 240000 (4 minutes)"}
+    if params.max_audio_length_ms < 10000:
+        return {"error": "max_audio_length_ms must be at least 10000 (10 seconds)"}
+
+    # Generate music
+    return generate_music(
+        lyrics=params.lyrics,
+        tags=params.tags,
+        max_audio_length_ms=params.max_audio_length_ms,
+        temperature=params.temperature,
+        topk=params.topk,
+        cfg_scale=params.cfg_scale,
+    )
 
 
 def handler(job):
@@ -185,44 +557,50 @@ def handler(job):
         dict with generation results or error
     """
     try:
-        job_input = job.get("input", {})
-
-        # Validate required input
-        lyrics = job_input.get("lyrics")
-        if not lyrics:
-            return {"error": "Missing required field: 'lyrics'"}
-
-        # Optional parameters
-        tags = job_input.get("tags", "pop,upbeat")
-        max_audio_length_ms = job_input.get("max_audio_length_ms", 120000)
-        temperature = job_input.get("temperature", 1.0)
-        topk = job_input.get("topk", 50)
-        cfg_scale = job_input.get("cfg_scale", 1.5)
-
-        # Validate parameters
-        if max_audio_length_ms > 240000:
-            return {"error": "max_audio_length_ms cannot exceed 240000 (4 minutes)"}
-        if max_audio_length_ms < 10000:
-            return {"error": "max_audio_length_ms must be at least 10000 (10 seconds)"}
-
-        # Generate music
-        result = generate_music(
-            lyrics=lyrics,
-            tags=tags,
-            max_audio_length_ms=max_audio_length_ms,
-            temperature=temperature,
-            topk=topk,
-            cfg_scale=cfg_scale,
-        )
+        result = run_job(job.get("input", {}))
+        if "error" in result:
+            return result
 
+        # Encode for transport only here, at the API boundary
+        buf = result.pop("audio_buffer")
+        if S3_BUCKET:
+            # Hand back a download link when storage is configured
+            result["audio_url"] = upload_audio(buf)
+        else:
+            result["audio_base64"] = encode_base64(buf)
         return result
 
     except Exception as e:
-        import traceback
-        return {
-            "error": str(e),
-            "traceback": traceback.format_exc()
-        }
+        result = {"error": str(e), "error_type": type(e).__name__}
+        if DEBUG_TRACEBACK:
+            result["traceback"] = traceback.format_exc()
+        return result
+
+
+def use_orjson_for_results():
+    """
+    Serialize job results with orjson inside the RunPod worker.
+
+    The worker's rp_http module encodes each result (including the multi-MB
+    audio_base64 string) with stdlib json. Its module-level ``json`` name is
+    swapped for a shim so only that call site changes, not json globally.
+    """
+    import json
+    import types
+
+    try:
+        import orjson
+        from runpod.serverless.modules import rp_http
+    except ImportError:
+        return
+
+    if getattr(rp_http, "json", None) is not json:
+        return
+
+    rp_http.json = types.SimpleNamespace(
+        dumps=lambda obj, **kwargs: orjson.dumps(obj).decode("utf-8"),
+        loads=json.loads,
+    )
 
 
 # For local testing
@@ -231,6 +609,9 @@ if __name__ == "__main__":
 
     # Test locally if no runpod
     if os.environ.get("RUNPOD_POD_ID"):
+        use_orjson_for_results()
+        if PRELOAD:
+            preload()
         runpod.serverless.start({"handler": handler})
     else:
         # Local test
@@ -252,7 +633,8 @@ A new creation""",
             }
         }
 
-        result = handler(test_job)
+        # Skip the transport encoding and write the raw MP3 directly
+        result = run_job(test_job["input"])
 
         if "error" in result:
             print(f"Error: {result['error']}")
@@ -261,5 +643,5 @@ A new creation""",
 
             # Save the output
             with open("test_output.mp3", "wb") as f:
-                f.write(base64.b64decode(result["audio_base64"]))
+                f.write(result["audio_buffer"].getbuffer())
             print("Saved to test_output.mp3")
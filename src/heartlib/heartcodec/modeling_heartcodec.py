@@ -156,9 +156,13 @@ class HeartCodec(PreTrainedModel):
             latent = latent.reshape(
                 latent.shape[0] * 2, latent.shape[2], latent.shape[3]
             )
-            cur_output = (
-                self.scalar_model.decode(latent.transpose(1, 2)).squeeze(0).squeeze(1)
-            )  # 1 512 256
+            # keep the waveform decoder in fp32 even under an outer autocast
+            with torch.autocast(device_type=torch.device(device).type, enabled=False):
+                cur_output = (
+                    self.scalar_model.decode(latent.transpose(1, 2))
+                    .squeeze(0)
+                    .squeeze(1)
+                )  # 1 512 256
 
             cur_output = cur_output[:, 0:min_samples].detach().cpu()  # B, T
             if cur_output.dim() == 3:
@@ -3,7 +3,7 @@ from tokenizers import Tokenizer
 from ..heartmula.modeling_heartmula import HeartMuLa
 from ..heartcodec.modeling_heartcodec import HeartCodec
 import torch
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, Union, BinaryIO
 import os
 from dataclasses import dataclass
 from tqdm import tqdm
@@ -11,6 +11,7 @@ import torchaudio
 import json
 from transformers import BitsAndBytesConfig
 from contextlib import nullcontext
+from functools import lru_cache
 
 
 @dataclass
@@ -48,6 +49,10 @@ class HeartMuLaGenPipeline(Pipeline):
         self._parallel_number = audio_codec.config.num_quantizers + 1
         self._muq_dim = model.config.muq_dim
 
+        # tag strings come from a small vocabulary; reuse their token ids.
+        # the tokenizer is fixed for the pipeline's lifetime, so entries never go stale.
+        self._encode_tags = lru_cache(maxsize=256)(self._encode_tags_uncached)
+
     def _sanitize_parameters(self, **kwargs):
         preprocess_kwargs = {"cfg_scale": kwargs.get("cfg_scale", 1.5)}
         forward_kwargs = {
@@ -58,18 +63,11 @@ class HeartMuLaGenPipeline(Pipeline):
         }
         postprocess_kwargs = {
             "save_path": kwargs.get("save_path", "output.mp3"),
+            "save_format": kwargs.get("save_format", None),
         }
         return preprocess_kwargs, forward_kwargs, postprocess_kwargs
 
-    def preprocess(self, inputs: Dict[str, Any], cfg_scale: float):
-
-        # process tags
-        tags = inputs["tags"]
-        if os.path.isfile(tags):
-            with open(tags, encoding="utf-8") as fp:
-                tags = fp.read()
-        assert isinstance(tags, str), f"tags must be a string, but got {type(tags)}"
-
+    def _encode_tags_uncached(self, tags: str) -> Tuple[int, ...]:
         tags = tags.lower()
         # encapsulate with special <tag> and </tag> tokens
         if not tags.startswith("<tag>"):
@@ -82,6 +80,18 @@ class HeartMuLaGenPipeline(Pipeline):
             tags_ids = [self.config.text_bos_id] + tags_ids
         if tags_ids[-1] != self.config.text_eos_id:
             tags_ids = tags_ids + [self.config.text_eos_id]
+        return tuple(tags_ids)
+
+    def preprocess(self, inputs: Dict[str, Any], cfg_scale: float):
+
+        # process tags
+        tags = inputs["tags"]
+        if os.path.isfile(tags):
+            with open(tags, encoding="utf-8") as fp:
+                tags = fp.read()
+        assert isinstance(tags, str), f"tags must be a string, but got {type(tags)}"
+
+        tags_ids = list(self._encode_tags(tags))
 
         # process reference audio
         ref_audio = inputs.get("ref_audio", None)
@@ -124,14 +134,25 @@ class HeartMuLaGenPipeline(Pipeline):
                 tensor = torch.cat([tensor, tensor], dim=0)
             return tensor
 
+        # pinned host memory lets the H2D copy in forward() run asynchronously
+        def _pin(tensor: torch.Tensor):
+            return tensor.pin_memory() if self.device.type == "cuda" else tensor
+
         return {
-            "tokens": _cfg_cat(tokens, cfg_scale),
-            "tokens_mask": _cfg_cat(tokens_mask, cfg_scale),
-            "muq_embed": _cfg_cat(muq_embed, cfg_scale),
+            "tokens": _pin(_cfg_cat(tokens, cfg_scale)),
+            "tokens_mask": _pin(_cfg_cat(tokens_mask, cfg_scale)),
+            "muq_embed": _pin(_cfg_cat(muq_embed, cfg_scale)),
             "muq_idx": [muq_idx] * bs_size,
-            "pos": _cfg_cat(torch.arange(prompt_len, dtype=torch.long), cfg_scale),
+            "pos": _pin(
+                _cfg_cat(torch.arange(prompt_len, dtype=torch.long), cfg_scale)
+            ),
         }
 
+    def _ensure_tensor_on_device(self, inputs, device):
+        if isinstance(inputs, torch.Tensor) and inputs.is_pinned():
+            return inputs.to(device, non_blocking=True)
+        return super()._ensure_tensor_on_device(inputs, device)
+
     def _forward(
         self,
         model_inputs: Dict[str, Any],
@@ -207,9 +228,15 @@ class HeartMuLaGenPipeline(Pipeline):
         wav = self.audio_codec.detokenize(frames, device=self.device)
         return {"wav": wav}
 
-    def postprocess(self, model_outputs: Dict[str, Any], save_path: str):
+    def postprocess(
+        self,
+        model_outputs: Dict[str, Any],
+        save_path: Union[str, BinaryIO],
+        save_format: Optional[str] = None,
+    ):
+        # save_format is required by torchaudio when save_path is a file-like object
         wav = model_outputs["wav"]
-        torchaudio.save(save_path, wav, 48000)
+        torchaudio.save(save_path, wav, 48000, format=save_format)
 
     @classmethod
     def from_pretrained(